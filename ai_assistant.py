@@ -8,6 +8,9 @@ logger = logging.getLogger(__name__)
 
 class AIAssistant:
     def __init__(self):
+        # True when the last process_message reply was canned (config error / API failure), not from the model
+        self.last_response_was_fallback = False
+
         self.api_key = os.getenv('OPENAI_API_KEY')
         if not self.api_key:
             logger.error("OPENAI_API_KEY not found in environment variables!")
@@ -106,7 +109,28 @@ class AIAssistant:
 
         return None
 
+    def record_message(self, message: str, username: str):
+        """Update game context and conversation history for a user message (also used for cached replies)"""
+        # Detect if user mentions a new game
+        detected_game = self.detect_game_mention(message)
+        if detected_game:
+            self.current_game = detected_game
+            self.game_start_time = datetime.now()
+            logger.info(f"Game context updated: {detected_game}")
+
+        # Add to conversation history
+        self.conversation_history.append({
+            "timestamp": datetime.now(),
+            "user": username,
+            "message": message
+        })
+
+        # Keep only last 10 messages to manage context
+        if len(self.conversation_history) > 10:
+            self.conversation_history = self.conversation_history[-10:]
+
     async def process_message(self, message: str, username: str, force_respond: bool = False) -> Optional[str]:
+        self.last_response_was_fallback = True  # cleared only when the model actually answers
         try:
             if not self.api_key:
                 return "Kak, aku belum dikonfigurasi dengan benar. Tolong cek API key-ku ya."
@@ -114,37 +138,16 @@ class AIAssistant:
             if not self.model:
                 return "Kak, ada masalah dengan model AI-ku. Tolong cek konfigurasi Gemini API."
 
-            # Detect if user mentions a new game
-            detected_game = self.detect_game_mention(message)
-            if detected_game:
-                self.current_game = detected_game
-                self.game_start_time = datetime.now()
-                logger.info(f"Game context updated: {detected_game}")
+            self.record_message(message, username)
 
             # Check if Sri should respond to this message (skip check if force_respond is True)
             if not force_respond and not self.should_respond(message):
-                # Add to conversation history but don't respond
-                self.conversation_history.append({
-                    "timestamp": datetime.now(),
-                    "user": username,
-                    "message": message
-                })
+                # Already in conversation history, but don't respond
                 return None
 
             # Add context about who is speaking
             contextual_message = f"User {username} says: {message}"
 
-            # Add to conversation history
-            self.conversation_history.append({
-                "timestamp": datetime.now(),
-                "user": username,
-                "message": message
-            })
-
-            # Keep only last 10 messages to manage context
-            if len(self.conversation_history) > 10:
-                self.conversation_history = self.conversation_history[-10:]
-
             # Build conversation context
             context = "\n".join([
                 f"{item['user']}: {item['message']}"
@@ -174,6 +177,7 @@ class AIAssistant:
                 )
 
                 if response.choices and response.choices[0].message.content:
+                    self.last_response_was_fallback = False
                     return response.choices[0].message.content.strip()
                 else:
                     logger.warning("OpenAI returned empty response")
@@ -8,12 +8,17 @@ import logging
 import asyncio
 import aiohttp
 import json
+from collections import OrderedDict
 from typing import Optional
-import tempfile
-import pygame
+import pyaudio
+from pcm_playback import play_pcm_chunks
 
 logger = logging.getLogger(__name__)
 
+async def _single_chunk(data: bytes):
+    """Async iterable over one bytes object (cached audio for play_pcm_chunks)"""
+    yield data
+
 class ElevenLabsTTS:
     def __init__(self):
         self.api_key = os.getenv('ELEVENLABS_API_KEY')
@@ -30,6 +35,10 @@ class ElevenLabsTTS:
             # Use cheapest model for cost optimization
             "model_id": "eleven_turbo_v2_5",  # Fastest & cheapest
 
+            # Raw 24 kHz mono PCM: streamable straight to the speaker, no MP3 decode
+            "output_format": "pcm_24000",
+            "sample_rate": 24000,
+
             # Voice settings optimized for Indonesian
             "voice_settings": {
                 "stability": 0.6,        # Good balance
@@ -44,9 +53,15 @@ class ElevenLabsTTS:
             "chunk_size": 250,               # Split long texts
         }
 
-        # Initialize pygame for audio playback
+        # Synthesized PCM for repeated phrases: (voice_id, text) -> bytes, LRU bounded by total size.
+        # A hit replays locally and costs no characters.
+        self._audio_cache = OrderedDict()
+        self._audio_cache_bytes = 0
+        self._audio_cache_limit = 32 * 1024 * 1024  # ~11 min of 24 kHz mono PCM
+
+        # Initialize PyAudio for streamed playback
         try:
-            pygame.mixer.init()
+            self._audio = pyaudio.PyAudio()
             logger.info("ElevenLabs TTS initialized successfully")
         except Exception as e:
             logger.error(f"Failed to initialize audio player: {e}")
@@ -152,8 +167,8 @@ class ElevenLabsTTS:
 
         return text
 
-    async def _text_to_speech_api(self, text: str) -> Optional[bytes]:
-        """Call ElevenLabs API to generate speech"""
+    async def _stream_speech(self, text: str, started: Optional[asyncio.Event] = None) -> bool:
+        """Stream speech from ElevenLabs and play PCM chunks as they arrive"""
         try:
             if not self.selected_voice_id:
                 await self._get_available_voices()
@@ -169,69 +184,89 @@ class ElevenLabsTTS:
                 "voice_settings": self.config["voice_settings"]
             }
 
-            url = f"{self.base_url}/text-to-speech/{self.selected_voice_id}"
+            url = f"{self.base_url}/text-to-speech/{self.selected_voice_id}/stream"
+            params = {"output_format": self.config["output_format"]}
 
             async with aiohttp.ClientSession() as session:
-                async with session.post(url, headers=headers, json=payload) as response:
-                    if response.status == 200:
-                        audio_data = await response.read()
-
-                        # Update usage tracking
-                        self.daily_usage += len(text)
-                        cost_estimate = len(text) * 0.00075  # ~$0.75 per 1K chars for Starter
-                        logger.info(f"ElevenLabs TTS: {len(text)} chars, ~${cost_estimate:.4f}, daily: {self.daily_usage}")
-
-                        return audio_data
-                    else:
+                async with session.post(url, headers=headers, json=payload, params=params) as response:
+                    if response.status != 200:
                         error_text = await response.text()
                         if response.status == 429:
                             logger.warning(f"ElevenLabs rate limit hit (429): System busy. Falling back to Local TTS.")
                         else:
                             logger.error(f"ElevenLabs API error {response.status}: {error_text}")
-                        return None
+                        return False
+
+                    # Playback starts with the first chunk instead of after the full download
+                    received = bytearray()
+                    await play_pcm_chunks(
+                        self._audio,
+                        response.content.iter_chunked(4096),
+                        self.config["sample_rate"],
+                        started=started,
+                        received=received
+                    )
+
+            self._cache_audio(text, bytes(received))
+
+            # Update usage tracking
+            self.daily_usage += len(text)
+            cost_estimate = len(text) * 0.00075  # ~$0.75 per 1K chars for Starter
+            logger.info(f"ElevenLabs TTS: {len(text)} chars, ~${cost_estimate:.4f}, daily: {self.daily_usage}")
+            return True
 
         except Exception as e:
             logger.error(f"ElevenLabs API request failed: {e}")
-            return None
+            return False
 
-    async def speak_async(self, text: str) -> bool:
-        """Generate and play speech asynchronously"""
+    def _cache_audio(self, text: str, pcm: bytes):
+        """Remember synthesized PCM for this voice/text, evicting least recently used entries"""
+        if not pcm or len(pcm) > self._audio_cache_limit:
+            return
+        key = (self.selected_voice_id, text)
+        old = self._audio_cache.pop(key, None)
+        if old is not None:
+            self._audio_cache_bytes -= len(old)
+        self._audio_cache[key] = pcm
+        self._audio_cache_bytes += len(pcm)
+        while self._audio_cache_bytes > self._audio_cache_limit:
+            _, evicted = self._audio_cache.popitem(last=False)
+            self._audio_cache_bytes -= len(evicted)
+
+    async def _play_cached(self, pcm: bytes, started: Optional[asyncio.Event] = None):
+        """Play cached PCM without touching the API"""
+        await play_pcm_chunks(self._audio, _single_chunk(pcm), self.config["sample_rate"], started=started)
+
+    async def speak_async(self, text: str, started: Optional[asyncio.Event] = None) -> bool:
+        """Generate and play speech asynchronously (`started` is set once audio begins playing)"""
         if not self.available:
             return False
 
         # Optimize text and check limits
         optimized_text = self._optimize_text(text)
+
+        # Repeated phrase: replay the cached audio (no request, no character cost)
+        cached = self._audio_cache.get((self.selected_voice_id, optimized_text))
+        if cached is not None:
+            self._audio_cache.move_to_end((self.selected_voice_id, optimized_text))
+            try:
+                logger.info(f"ElevenLabs TTS: Playing cached audio for: {optimized_text[:50]}...")
+                await self._play_cached(cached, started)
+                return True
+            except Exception as e:
+                logger.error(f"ElevenLabs TTS playback error: {e}")
+                return False
+
         if not self._check_usage_limit(len(optimized_text)):
             logger.warning("ElevenLabs usage limit exceeded, skipping TTS")
             return False
 
         try:
-            # Generate speech
+            # Generate and play speech
             logger.info(f"ElevenLabs TTS: Generating speech for: {optimized_text[:50]}...")
-            audio_data = await self._text_to_speech_api(optimized_text)
-
-            if not audio_data:
+            if not await self._stream_speech(optimized_text, started):
                 return False
 
-            # Save to temporary file and play
-            with tempfile.NamedTemporaryFile(suffix='.mp3', delete=False) as temp_file:
-                temp_file.write(audio_data)
-                temp_path = temp_file.name
-
-            # Play audio using pygame
-            pygame.mixer.music.load(temp_path)
-            pygame.mixer.music.play()
-
-            # Wait for playback to complete
-            while pygame.mixer.music.get_busy():
-                await asyncio.sleep(0.1)
-
-            # Cleanup
-            try:
-                os.unlink(temp_path)
-            except:
-                pass
-
             logger.info("ElevenLabs TTS: Playback completed")
             return True
 
@@ -1,19 +1,58 @@
 import logging
 import asyncio
 import subprocess
-import tempfile
 import os
+import shutil
 import time
+import pyaudio
+from pcm_playback import play_pcm_chunks, read_chunks
 
 logger = logging.getLogger(__name__)
 
+# Runs for the lifetime of LocalTTS: loads System.Speech once, then speaks each stdin line
+# and answers on stdout when done (replaces one PowerShell launch per utterance)
+_SAPI_LOOP_SCRIPT = '''
+[Console]::InputEncoding = [System.Text.Encoding]::UTF8
+Add-Type -AssemblyName System.Speech
+$synth = New-Object System.Speech.Synthesis.SpeechSynthesizer
+$synth.SelectVoiceByHints('Female')
+$synth.Rate = 0
+while ($true) {
+    $line = [Console]::In.ReadLine()
+    if ($line -eq $null) { break }
+    $synth.Speak($line)
+    [Console]::Out.WriteLine('done')
+    [Console]::Out.Flush()
+}
+$synth.Dispose()
+'''
+
 class LocalTTS:
     def __init__(self):
-        """Initialize local text-to-speech using Windows PowerShell SAPI"""
+        """Initialize local text-to-speech using Piper (if configured) or Windows PowerShell SAPI"""
         try:
             self.available = True
             self.is_speaking = False
 
+            # Optional Piper neural TTS: used instead of SAPI when PIPER_MODEL is set and piper is installed
+            self.piper_model = os.getenv('PIPER_MODEL', '').strip()
+            self.piper_sample_rate = int(os.getenv('PIPER_SAMPLE_RATE', '22050'))
+            self._piper = shutil.which('piper') if self.piper_model else None
+            self._audio = None
+
+            # Utterances play one after another from an asyncio queue (worker created on first use,
+            # since that's the first point where the bot's loop is running)
+            self._queue = None
+            self._worker = None
+            self._process = None  # persistent PowerShell SAPI process, started on first utterance
+
+            if self._piper:
+                self._audio = pyaudio.PyAudio()
+                logger.info(f"Local TTS initialized successfully using Piper ({self.piper_model})")
+                return
+            if self.piper_model:
+                logger.warning("PIPER_MODEL is set but 'piper' was not found on PATH, using Windows SAPI")
+
             # Test if PowerShell TTS works
             test_result = subprocess.run([
                 'powershell', '-Command',
@@ -31,57 +70,115 @@ class LocalTTS:
             logger.error(f"Failed to initialize local TTS: {e}")
             self.available = False
 
+    def _ensure_worker(self):
+        """Start the speech worker on the running loop if it isn't already running"""
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.get_running_loop().create_task(self._speech_worker())
+
+    async def _speech_worker(self):
+        """Speak queued utterances in order; wakes only when something is put on the queue"""
+        while True:
+            text, done = await self._queue.get()
+            success = await self._speak_async(text)
+            if done is not None and not done.done():
+                done.set_result(success)
+
     def speak(self, text: str):
-        """Speak text using Windows PowerShell SAPI (non-blocking)"""
+        """Speak text using Windows PowerShell SAPI (non-blocking, queued behind current speech)"""
         if not self.available or not text.strip():
             return False
 
-        if self.is_speaking:
-            logger.info("TTS already speaking, queuing not implemented yet")
+        try:
+            self._ensure_worker()
+        except RuntimeError as e:
+            logger.error(f"TTS: No running event loop: {e}")
             return False
 
-        # Use asyncio to run TTS in background
-        asyncio.create_task(self._speak_async(text.strip()))
+        self._queue.put_nowait((text.strip(), None))
         return True  # Return True for successful initiation
 
-    async def _speak_async(self, text: str):
-        """Async TTS using PowerShell subprocess"""
-        try:
-            self.is_speaking = True
-            logger.info(f"TTS: Starting to speak: {text[:50]}...")
+    async def speak_and_wait(self, text: str) -> bool:
+        """Speak text and return once playback has actually finished"""
+        if not self.available or not text.strip():
+            return False
 
-            # Escape text for PowerShell
-            escaped_text = text.replace('"', '""').replace("'", "''")
-
-            # PowerShell command to use SAPI with female voice
-            powershell_cmd = f'''
-            Add-Type -AssemblyName System.Speech
-            $synth = New-Object System.Speech.Synthesis.SpeechSynthesizer
-            $synth.SelectVoiceByHints('Female')
-            $synth.Rate = 0
-            $synth.Speak("{escaped_text}")
-            $synth.Dispose()
-            '''
-
-            # Run PowerShell command
-            process = await asyncio.create_subprocess_exec(
-                'powershell', '-Command', powershell_cmd,
-                stdout=asyncio.subprocess.DEVNULL,
+        self._ensure_worker()
+        done = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((text.strip(), done))
+        return await done
+
+    async def _ensure_process(self):
+        """Start the long-lived SAPI PowerShell process if it isn't running"""
+        if self._process is None or self._process.returncode is not None:
+            self._process = await asyncio.create_subprocess_exec(
+                'powershell', '-NoProfile', '-Command', _SAPI_LOOP_SCRIPT,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
                 stderr=asyncio.subprocess.DEVNULL,
                 creationflags=subprocess.CREATE_NO_WINDOW
             )
+        return self._process
+
+    async def _speak_piper(self, text: str) -> bool:
+        """Synthesize with Piper and play its raw PCM output as it is produced"""
+        process = await asyncio.create_subprocess_exec(
+            self._piper, '--model', self.piper_model, '--output_raw',
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+            creationflags=getattr(subprocess, 'CREATE_NO_WINDOW', 0)
+        )
+        process.stdin.write(' '.join(text.split()).encode('utf-8') + b'\n')
+        await process.stdin.drain()
+        process.stdin.close()
+
+        await play_pcm_chunks(self._audio, read_chunks(process.stdout), self.piper_sample_rate)
+        await process.wait()
+        return process.returncode == 0
+
+    async def _speak_async(self, text: str) -> bool:
+        """Async TTS via Piper or the persistent PowerShell SAPI process (completes when the line is spoken)"""
+        try:
+            self.is_speaking = True
+            logger.info(f"TTS: Starting to speak: {text[:50]}...")
+
+            if self._piper:
+                if not await self._speak_piper(text):
+                    logger.error("TTS: Piper exited with an error")
+                    return False
+                logger.info(f"TTS: Finished speaking: {text[:30]}...")
+                return True
+
+            process = await self._ensure_process()
+
+            # One utterance per line; text travels over stdin, so no PowerShell escaping is needed
+            line = ' '.join(text.split())
+            process.stdin.write((line + '\n').encode('utf-8'))
+            await process.stdin.drain()
+
+            # The script answers once Speak() returns
+            if not await process.stdout.readline():
+                logger.error("TTS: SAPI process exited unexpectedly, restarting on next utterance")
+                self._process = None
+                return False
 
-            await process.wait()
             logger.info(f"TTS: Finished speaking: {text[:30]}...")
+            return True
 
         except Exception as e:
             logger.error(f"TTS: Error during speech: {e}")
+            self._process = None
+            return False
         finally:
             self.is_speaking = False
 
     def stop(self):
-        """Stop TTS (not needed for subprocess approach)"""
-        pass
+        """Stop TTS and shut down the SAPI process"""
+        if self._process is not None and self._process.returncode is None:
+            self._process.kill()
+        self._process = None
 
     def is_available(self):
         """Check if TTS is available"""
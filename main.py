@@ -6,10 +6,17 @@ from dotenv import load_dotenv
 import logging
 import signal
 import sys
+import traceback
+from collections import OrderedDict
 from ai_assistant import AIAssistant
 from voice_handler import VoiceHandler
 from stream_manager import StreamManager
 
+try:
+    import psutil
+except ImportError:
+    psutil = None  # Optional: memory checks are skipped without it
+
 load_dotenv()
 
 logging.basicConfig(
@@ -19,22 +26,54 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Interned once so the per-event channel check can short-circuit on identity
+TARGET_CHANNEL_NAME = sys.intern(os.getenv('VOICE_CHANNEL_NAME', 'Sri-Voice'))
+
 intents = discord.Intents.default()
 intents.message_content = True  # Privileged intent - enable in Discord Developer Portal
 intents.voice_states = True
 intents.guilds = True
 
+# Only members currently in voice need caching (handle_user_leave counts channel.members)
+member_cache_flags = discord.MemberCacheFlags.none()
+member_cache_flags.voice = True
+
 class StreamAIBot(commands.Bot):
+    # commands.Bot keeps its own __dict__; these slots only cover the hot attributes we add
+    __slots__ = (
+        'ai_assistant',
+        'voice_handler',
+        'stream_manager',
+        'recent_voice_responses',
+        'voice_response_timeout',
+        'startup_time',
+        'last_health_check',
+        '_ai_cache',
+        'ai_cache_ttl',
+        'ai_cache_size',
+    )
+
     def __init__(self):
-        super().__init__(command_prefix='!', intents=intents)
+        super().__init__(
+            command_prefix='!',
+            intents=intents,
+            chunk_guilds_at_startup=False,
+            member_cache_flags=member_cache_flags,
+            max_messages=None  # No message cache needed (we never react to edits/deletes)
+        )
         self.ai_assistant = AIAssistant()
         self.voice_handler = VoiceHandler(self)
         self.stream_manager = StreamManager()
 
         # Track recent voice responses to avoid duplicates
-        self.recent_voice_responses = []
+        self.recent_voice_responses = OrderedDict()  # normalized message -> timestamp, oldest first
         self.voice_response_timeout = 5  # seconds
 
+        # Short-lived LRU of AI responses keyed by (normalized content, author)
+        self._ai_cache = OrderedDict()  # key -> (response, expires_at)
+        self.ai_cache_ttl = 60  # seconds
+        self.ai_cache_size = 256
+
         # Health monitoring
         self.startup_time = None
         self.last_health_check = None
@@ -48,7 +87,7 @@ class StreamAIBot(commands.Bot):
                 # Cleanup push-to-talk system
                 if hasattr(self.voice_handler, 'push_to_talk') and self.voice_handler.push_to_talk:
                     try:
-                        self.voice_handler.push_to_talk.stop_listening()
+                        self.voice_handler.push_to_talk.shutdown()
                     except Exception as ptt_error:
                         logger.warning(f"Error stopping push-to-talk: {ptt_error}")
 
@@ -72,7 +111,7 @@ class StreamAIBot(commands.Bot):
                 # Cleanup push-to-talk system
                 if hasattr(self.voice_handler, 'push_to_talk') and self.voice_handler.push_to_talk:
                     try:
-                        self.voice_handler.push_to_talk.stop_listening()
+                        self.voice_handler.push_to_talk.shutdown()
                     except Exception as ptt_error:
                         logger.warning(f"Error stopping push-to-talk: {ptt_error}")
 
@@ -98,8 +137,7 @@ class StreamAIBot(commands.Bot):
     async def health_monitor(self):
         """Monitor bot health and log status"""
         try:
-            import time
-            current_time = time.time()
+            current_time = asyncio.get_running_loop().time()
 
             # Check voice system health
             voice_healthy = True
@@ -112,14 +150,14 @@ class StreamAIBot(commands.Bot):
             logger.info(f"Health Check - Uptime: {uptime_mins:.1f}m, Voice: {'✓' if voice_healthy else '✗'}, Guilds: {len(self.guilds)}")
 
             # Check memory usage
-            try:
-                import psutil
-                process = psutil.Process()
-                memory_mb = process.memory_info().rss / 1024 / 1024
-                if memory_mb > 500:  # Alert if over 500MB
-                    logger.warning(f"High memory usage detected: {memory_mb:.1f} MB")
-            except Exception:
-                pass
+            if psutil is not None:
+                try:
+                    process = psutil.Process()
+                    memory_mb = process.memory_info().rss / 1024 / 1024
+                    if memory_mb > 500:  # Alert if over 500MB
+                        logger.warning(f"High memory usage detected: {memory_mb:.1f} MB")
+                except Exception:
+                    pass
 
             self.last_health_check = current_time
 
@@ -131,8 +169,7 @@ class StreamAIBot(commands.Bot):
         await self.wait_until_ready()
 
     async def on_ready(self):
-        import time
-        self.startup_time = time.time()
+        self.startup_time = asyncio.get_running_loop().time()
         logger.info(f'{self.user} has connected to Discord!')
         logger.info(f'Sri is in {len(self.guilds)} guilds')
 
@@ -147,25 +184,38 @@ class StreamAIBot(commands.Bot):
             return
 
         # Check if this message was recently processed as voice input
-        import time
-        current_time = time.time()
+        # (monotonic loop clock, so wall-clock jumps can't break the dedup window)
+        current_time = asyncio.get_running_loop().time()
 
-        # Clean old voice responses
-        self.recent_voice_responses = [
-            (msg, timestamp) for msg, timestamp in self.recent_voice_responses
-            if current_time - timestamp < self.voice_response_timeout
-        ]
+        # Clean old voice responses (entries are inserted in time order)
+        recent = self.recent_voice_responses
+        while recent and current_time - next(iter(recent.values())) >= self.voice_response_timeout:
+            recent.popitem(last=False)
 
-        # Check if this message content was recently processed as voice
+        # Check if this message content was recently processed as voice (keys are pre-normalized)
         message_lower = message.content.lower().strip()
-        for recent_msg, timestamp in self.recent_voice_responses:
-            if message_lower == recent_msg.lower().strip():
-                logger.info(f"Skipping text response - already processed as voice: {message_lower}")
-                await self.process_commands(message)
-                return
+        if message_lower in recent:
+            logger.info(f"Skipping text response - already processed as voice: {message_lower}")
+            await self.process_commands(message)
+            return
 
-        # Process the message through AI assistant
-        response = await self.ai_assistant.process_message(message.content, message.author.display_name)
+        # Reuse a recent answer for an identical prompt instead of another AI round-trip
+        cache_key = (message_lower, message.author.display_name)
+        cached = self._ai_cache.get(cache_key)
+        if cached and cached[1] > current_time:
+            self._ai_cache.move_to_end(cache_key)
+            response = cached[0]
+            # Still count the turn, so history and game context match an uncached request
+            self.ai_assistant.record_message(message.content, message.author.display_name)
+        else:
+            # Process the message through AI assistant
+            response = await self.ai_assistant.process_message(message.content, message.author.display_name)
+            # Only genuine model replies are cached; canned fallbacks (API errors, missing key) are not
+            if response and not self.ai_assistant.last_response_was_fallback:
+                self._ai_cache[cache_key] = (response, current_time + self.ai_cache_ttl)
+                self._ai_cache.move_to_end(cache_key)
+                if len(self._ai_cache) > self.ai_cache_size:
+                    self._ai_cache.popitem(last=False)
 
         if response:
             # Send text response to chat
@@ -177,15 +227,27 @@ class StreamAIBot(commands.Bot):
         # Process commands as well
         await self.process_commands(message)
 
+    async def on_guild_channel_create(self, channel):
+        self.voice_handler.invalidate_text_channel(channel.guild)
+
+    async def on_guild_channel_update(self, before, after):
+        self.voice_handler.invalidate_text_channel(after.guild)
+
+    async def on_guild_channel_delete(self, channel):
+        self.voice_handler.invalidate_text_channel(channel.guild)
+
+    async def on_guild_role_update(self, before, after):
+        self.voice_handler.invalidate_text_channel(after.guild)
+
     async def on_voice_state_update(self, member, before, after):
         if member == self.user:
             return
 
-        target_channel_name = os.getenv('VOICE_CHANNEL_NAME', 'Sri-Voice')
-
         # User left the target channel
-        if before.channel and before.channel.name == target_channel_name:
-            if not after.channel or after.channel.name != target_channel_name:
+        before_name = before.channel.name if before.channel else None
+        if before_name is TARGET_CHANNEL_NAME or before_name == TARGET_CHANNEL_NAME:
+            after_name = after.channel.name if after.channel else None
+            if after_name is not TARGET_CHANNEL_NAME and after_name != TARGET_CHANNEL_NAME:
                 # Only handle if they actually left (not moved within same channel)
                 await self.voice_handler.handle_user_leave(member, before.channel)
 
@@ -411,13 +473,14 @@ async def test_push_to_talk_key(ctx):
     else:
         await ctx.send("❌ Push-to-talk system tidak tersedia")
 
+SHUTDOWN_MESSAGE = "👋 **Dadah Kak! Sri mau istirahat dulu...**\n\n🔇 Stopping all voice functions...\n📞 Disconnecting from voice...\n🛑 Shutting down bot..."
+
 @bot.command(name='shutdown')
 async def shutdown_bot(ctx):
-    # Send goodbye message
-    await ctx.send("👋 **Dadah Kak! Sri mau istirahat dulu...**\n\n🔇 Stopping all voice functions...\n📞 Disconnecting from voice...\n🛑 Shutting down bot...")
-
-    # Use proper async cleanup
-    await bot.async_cleanup_resources()
+    # Send goodbye message while async cleanup runs, so teardown doesn't wait on the Discord API
+    send_task = asyncio.create_task(ctx.send(SHUTDOWN_MESSAGE))
+    cleanup_task = asyncio.create_task(bot.async_cleanup_resources())
+    await asyncio.gather(send_task, cleanup_task, return_exceptions=True)
 
     # Disconnect from voice if connected
     if ctx.voice_client:
@@ -428,7 +491,6 @@ async def shutdown_bot(ctx):
     logger.info("Sri bot has been shut down by user command")
 
     # Exit the program
-    import sys
     sys.exit(0)
 
 def signal_handler(signum, frame):
@@ -462,19 +524,18 @@ if __name__ == "__main__":
     except Exception as e:
         logger.error(f"CRITICAL: Bot crashed with unexpected error: {e}")
         logger.error(f"Error type: {type(e).__name__}")
-        import traceback
         logger.error(f"Full traceback:\n{traceback.format_exc()}")
 
         # Log system state for debugging
-        try:
-            import psutil
-            process = psutil.Process()
-            logger.error(f"Memory usage: {process.memory_info().rss / 1024 / 1024:.1f} MB")
-            logger.error(f"CPU usage: {process.cpu_percent():.1f}%")
-            logger.error(f"Thread count: {process.num_threads()}")
-            logger.error(f"Open files: {len(process.open_files())}")
-        except Exception as debug_error:
-            logger.error(f"Could not gather system info: {debug_error}")
+        if psutil is not None:
+            try:
+                process = psutil.Process()
+                logger.error(f"Memory usage: {process.memory_info().rss / 1024 / 1024:.1f} MB")
+                logger.error(f"CPU usage: {process.cpu_percent():.1f}%")
+                logger.error(f"Thread count: {process.num_threads()}")
+                logger.error(f"Open files: {len(process.open_files())}")
+            except Exception as debug_error:
+                logger.error(f"Could not gather system info: {debug_error}")
 
         # Force cleanup on crash
         try:
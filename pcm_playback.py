@@ -0,0 +1,39 @@
+import asyncio
+from typing import AsyncIterable, Optional
+import pyaudio
+
+async def read_chunks(reader: asyncio.StreamReader, size: int = 4096):
+    """Yield a subprocess pipe's output in chunks of up to `size` bytes until EOF"""
+    while True:
+        chunk = await reader.read(size)
+        if not chunk:
+            return
+        yield chunk
+
+async def play_pcm_chunks(audio: pyaudio.PyAudio, chunks: AsyncIterable[bytes], rate: int,
+                          started: Optional[asyncio.Event] = None,
+                          received: Optional[bytearray] = None):
+    """Play 16-bit mono PCM as it arrives; returns once the last sample has been played
+
+    `started` is set when the first audio goes out; every played byte is appended to `received`.
+    """
+    loop = asyncio.get_running_loop()
+    stream = audio.open(format=pyaudio.paInt16, channels=1, rate=rate, output=True)
+    try:
+        pending = b""
+        async for chunk in chunks:
+            # Chunks can split a 16-bit sample; carry the odd byte over
+            data = pending + chunk
+            usable = len(data) - (len(data) % 2)
+            pending = data[usable:]
+            if usable:
+                if started is not None:
+                    started.set()  # first audio is going out
+                if received is not None:
+                    received += data[:usable]
+                await loop.run_in_executor(None, stream.write, data[:usable])
+
+        # stop_stream blocks until the buffered audio has finished playing
+        await loop.run_in_executor(None, stream.stop_stream)
+    finally:
+        stream.close()
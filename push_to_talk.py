@@ -4,15 +4,63 @@ Allows user to hold a key while speaking, then release to trigger speech process
 """
 
 import logging
+import re
 import threading
 import time
 from typing import Callable, Optional
+import numpy as np
 import speech_recognition as sr
+import pyaudio
 from pynput import keyboard
 import os
+import queue
 
 logger = logging.getLogger(__name__)
 
+# Common Indonesian speech recognition errors for the name "sri" (whole words only)
+_SRI_FIXES = {
+    'sry': 'sri',
+    'shri': 'sri',
+    'seri': 'sri',
+    'cri': 'sri',
+    'tree': 'sri',
+    'free': 'sri'
+}
+_SRI_FIX_RE = re.compile(r'\b(' + '|'.join(map(re.escape, _SRI_FIXES)) + r')\b')
+
+# Recognizer and microphone are process-wide: a new listener (e.g. after a config change)
+# reuses them instead of re-probing the audio devices
+_SHARED_RECOGNIZER = sr.Recognizer()
+_SHARED_MICROPHONE = None
+_MIC_LOCK = threading.Lock()
+
+def _get_shared_microphone() -> sr.Microphone:
+    """Create the default microphone once per process (failures are not cached)"""
+    global _SHARED_MICROPHONE
+    with _MIC_LOCK:
+        if _SHARED_MICROPHONE is None:
+            _SHARED_MICROPHONE = sr.Microphone()
+        return _SHARED_MICROPHONE
+
+# Freelist of preallocated int16 capture buffers, reused across push-to-talk presses
+_BUF_POOL = []
+_POOL_LOCK = threading.Lock()
+_POOL_MAX = 4
+
+def _acquire_buf(samples: int) -> np.ndarray:
+    """Take a pooled int16 capture buffer of exactly `samples` samples, or allocate a new one"""
+    with _POOL_LOCK:
+        for i, buf in enumerate(_BUF_POOL):
+            if buf.size == samples:
+                return _BUF_POOL.pop(i)
+    return np.empty(samples, dtype=np.int16)
+
+def _release_buf(buf: np.ndarray):
+    """Return a capture buffer to the pool"""
+    with _POOL_LOCK:
+        if len(_BUF_POOL) < _POOL_MAX:
+            _BUF_POOL.append(buf)
+
 class PushToTalkListener:
     def __init__(self, callback_func: Callable[[str], None], recording_state_callback: Optional[Callable[[bool], None]] = None):
         """
@@ -24,7 +72,7 @@ class PushToTalkListener:
         """
         self.callback_func = callback_func
         self.recording_state_callback = recording_state_callback
-        self.recognizer = sr.Recognizer()
+        self.recognizer = _SHARED_RECOGNIZER
         self.microphone = None
 
         # Push-to-talk state
@@ -32,11 +80,20 @@ class PushToTalkListener:
         self.is_listening_active = False
         self.recording_thread = None
         self.keyboard_listener = None
+        self._recording_stopped = threading.Event()  # current recording's stop signal, replaced per recording
 
         # Configuration from environment or defaults
         self.talk_key = os.getenv('PUSH_TO_TALK_KEY', 'f1').lower()  # Default F1 key
         self.min_recording_duration = 0.5  # Minimum recording duration in seconds
         self.max_recording_duration = 30.0  # Maximum recording duration in seconds
+        self.silence_peak_threshold = 500  # int16 peak below this is treated as silence
+        try:
+            self.silence_rms_threshold = float(os.getenv('PTT_SILENCE_RMS', '150'))  # int16 RMS below this is silence
+        except ValueError:
+            logger.warning(f"Invalid PTT_SILENCE_RMS '{os.getenv('PTT_SILENCE_RMS')}', using 150")
+            self.silence_rms_threshold = 150.0
+        self.short_clip_duration = 1.0  # clips up to this long may be merged with the next one
+        self.coalesce_window = 1.0  # seconds to wait for a follow-up tap (covers its 0.5 s minimum hold)
 
         # Key mapping for common problematic keys
         self.key_mappings = {
@@ -55,26 +112,30 @@ class PushToTalkListener:
         # Validate key configuration
         self._validate_key_config()
 
+        # Precomputed once: every global key event is checked against this set
+        self._target_keys = frozenset([self.talk_key] + list(self.key_mappings.get(self.talk_key, [])))
+        self._debug_mode = os.getenv('PTT_DEBUG', 'false').lower() == 'true'
+        self._keyname_cache = {}  # key identity -> normalized key name
+
         # Audio buffer for recording
         self.audio_buffer = None
         self.recording_start_time = 0
+        self._warned_ready = False  # "Microphone ready" is only logged for the first recording
+
+        # Single long-lived worker runs speech recognition so recording threads never block on HTTP
+        self._asr_queue = queue.Queue(maxsize=4)
+        self._asr_worker = threading.Thread(target=self._asr_loop, name="PushToTalkASR", daemon=True)
+        self._asr_worker.start()
 
         # Initialize microphone
         try:
-            self.microphone = sr.Microphone()
+            self.microphone = _get_shared_microphone()
+            self._sample_rate = self.microphone.SAMPLE_RATE
+            self._sample_width = self.microphone.SAMPLE_WIDTH
             logger.info("Push-to-talk microphone initialized")
 
-            # Adjust for ambient noise
-            with self.microphone as source:
-                logger.info("Adjusting push-to-talk microphone for ambient noise...")
-                self.recognizer.adjust_for_ambient_noise(source, duration=1)
-
-            # Configure recognizer for push-to-talk (optimized for longer speech)
-            self.recognizer.energy_threshold = 150  # Lower threshold for better sensitivity
-            self.recognizer.dynamic_energy_threshold = False  # Keep fixed threshold for consistency
-            self.recognizer.pause_threshold = 2.0  # Allow much longer pauses within speech (2 seconds)
-            self.recognizer.phrase_threshold = 0.3  # Minimum silence to consider phrase start
-            self.recognizer.non_speaking_duration = 2.0  # Allow longer pauses before stopping (2 seconds)
+            # No ambient-noise calibration or VAD tuning: the key press already bounds the
+            # utterance and the raw capture never goes through recognizer.listen()
 
             logger.info("Push-to-talk system initialized successfully")
 
@@ -112,12 +173,13 @@ class PushToTalkListener:
             return True
 
         try:
-            # Start keyboard listener
-            self.keyboard_listener = keyboard.Listener(
-                on_press=self._on_key_press,
-                on_release=self._on_key_release
-            )
-            self.keyboard_listener.start()
+            # Install the keyboard hook once; later start/stop cycles only flip is_listening_active
+            if self.keyboard_listener is None:
+                self.keyboard_listener = keyboard.Listener(
+                    on_press=self._on_key_press,
+                    on_release=self._on_key_release
+                )
+                self.keyboard_listener.start()
             self.is_listening_active = True
 
             logger.info(f"🎤 Push-to-talk active! Hold [{self.talk_key.upper()}] key while speaking")
@@ -129,40 +191,49 @@ class PushToTalkListener:
                 logger.info(f"Key alternatives: {alternatives}")
 
             # Enable debug only if explicitly requested
-            debug_mode = os.getenv('PTT_DEBUG', 'false').lower() == 'true'
-            if debug_mode:
-                import logging
+            if self._debug_mode:
                 keyboard_logger = logging.getLogger('push_to_talk')
                 keyboard_logger.setLevel(logging.DEBUG)
                 logger.info("⚠ Debug mode enabled - akan log key presses untuk troubleshooting")
 
             return True
 
-        except Exception as e:
-            logger.error(f"Failed to start push-to-talk listener: {e}")
-            import traceback
-            logger.error(f"Push-to-talk start error traceback: {traceback.format_exc()}")
+        except Exception:
+            logger.exception("Failed to start push-to-talk listener")
             return False
 
     def stop_listening(self):
-        """Stop push-to-talk system"""
+        """Stop push-to-talk system (keyboard hook stays installed for the next start)"""
         self.is_listening_active = False
 
-        # Stop keyboard listener
-        if self.keyboard_listener:
-            self.keyboard_listener.stop()
-            self.keyboard_listener = None
-
         # Stop any ongoing recording
         if self.is_recording:
             self.is_recording = False
+            self._recording_stopped.set()
             if self.recording_thread:
                 self.recording_thread.join(timeout=2)
 
         logger.info("Push-to-talk stopped")
 
+    def shutdown(self):
+        """Stop push-to-talk and remove the keyboard hook (process exit)"""
+        self.stop_listening()
+
+        if self.keyboard_listener:
+            self.keyboard_listener.stop()
+            self.keyboard_listener = None
+
+        # Sentinel lets the recognition worker exit after draining queued recordings
+        try:
+            self._asr_queue.put_nowait(None)
+        except queue.Full:
+            pass
+
     def _on_key_press(self, key):
         """Handle key press events"""
+        if not self.is_listening_active:
+            return
+
         try:
             # Check if the pressed key matches our talk key
             key_name = self._get_key_name(key)
@@ -170,8 +241,7 @@ class PushToTalkListener:
             # Only log when target key is pressed (reduce noise)
             if self._is_target_key(key_name) and not self.is_recording:
                 # Debug logging only for matching keys (when explicitly enabled)
-                debug_mode = os.getenv('PTT_DEBUG', 'false').lower() == 'true'
-                if debug_mode:
+                if self._debug_mode:
                     logger.info(f"🔍 Key pressed: '{key_name}' | Target: '{self.talk_key}' | Match: True")
 
             if self._is_target_key(key_name) and not self.is_recording:
@@ -186,35 +256,43 @@ class PushToTalkListener:
 
                 self._start_recording()
 
-        except Exception as e:
-            logger.error(f"Error in key press handler: {e}")
-            import traceback
-            logger.error(f"Key press traceback: {traceback.format_exc()}")
+        except Exception:
+            logger.exception("Error in key press handler")
 
     def _on_key_release(self, key):
         """Handle key release events"""
+        if not self.is_listening_active:
+            return
+
         try:
             # Check if the released key matches our talk key
             key_name = self._get_key_name(key)
 
             # Only log debug info if debug mode is enabled
-            if os.getenv('PTT_DEBUG', 'false').lower() == 'true':
-                logger.debug(f"Key released: '{key_name}' (target: '{self.talk_key}')")
+            if self._debug_mode and logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Key released: '%s' (target: '%s')", key_name, self.talk_key)
 
             if self._is_target_key(key_name) and self.is_recording:
                 logger.info(f"Talk key '{key_name}' (mapped to '{self.talk_key}') released! Stopping recording...")
                 self._stop_recording()
 
-        except Exception as e:
-            logger.error(f"Error in key release handler: {e}")
-            import traceback
-            logger.error(f"Key release traceback: {traceback.format_exc()}")
+        except Exception:
+            logger.exception("Error in key release handler")
 
     def _get_key_name(self, key) -> str:
         """Get normalized key name"""
         try:
-            # Detailed debugging only if debug mode is enabled
-            debug_mode = os.getenv('PTT_DEBUG', 'false').lower() == 'true'
+            # Detailed debugging only if debug mode is enabled and the logger would emit it
+            debug_mode = self._debug_mode and logger.isEnabledFor(logging.DEBUG)
+
+            # Normalized names are fully determined by the key identity, so memoize them.
+            # Char keys are keyed on (vk, char) since shifted chars share a vk.
+            vk = getattr(key, 'vk', None)
+            cache_key = (vk, getattr(key, 'char', None)) if vk is not None else key
+            if not debug_mode:
+                cached_name = self._keyname_cache.get(cache_key)
+                if cached_name is not None:
+                    return cached_name
 
             if debug_mode:
                 key_attrs = {
@@ -224,39 +302,32 @@ class PushToTalkListener:
                     'key_type': type(key).__name__,
                     'key_str': str(key)
                 }
-                logger.debug(f"Key attributes: {key_attrs}")
+                logger.debug("Key attributes: %s", key_attrs)
 
             if hasattr(key, 'name'):
                 key_name = key.name.lower()
                 if debug_mode:
-                    logger.debug(f"Using key.name: '{key_name}'")
-                return key_name
+                    logger.debug("Using key.name: '%s'", key_name)
             elif hasattr(key, 'char') and key.char:
                 key_name = key.char.lower()
                 if debug_mode:
-                    logger.debug(f"Using key.char: '{key_name}'")
-                return key_name
+                    logger.debug("Using key.char: '%s'", key_name)
             else:
                 key_name = str(key).lower().replace("'", "")
                 if debug_mode:
-                    logger.debug(f"Using str(key): '{key_name}'")
-                return key_name
+                    logger.debug("Using str(key): '%s'", key_name)
+
+            if len(self._keyname_cache) > 256:
+                self._keyname_cache.clear()
+            self._keyname_cache[cache_key] = key_name
+            return key_name
         except Exception as e:
             logger.error(f"Error in _get_key_name: {e}")
             return ""
 
     def _is_target_key(self, detected_key_name: str) -> bool:
         """Check if detected key matches our target key (with mappings)"""
-        # Direct match
-        if detected_key_name == self.talk_key:
-            return True
-
-        # Check mappings
-        if self.talk_key in self.key_mappings:
-            return detected_key_name in self.key_mappings[self.talk_key]
-
-        # No mapping found, just do direct comparison
-        return False
+        return detected_key_name in self._target_keys
 
     def _start_recording(self):
         """Start recording audio"""
@@ -265,9 +336,16 @@ class PushToTalkListener:
 
         self.is_recording = True
         self.recording_start_time = time.time()
+        # Fresh event per recording: a previous thread still shutting down keeps its own
+        # and can't clear is_recording for this one
+        self._recording_stopped = threading.Event()
 
         # Start recording in a separate thread (callback already called in key press handler)
-        self.recording_thread = threading.Thread(target=self._record_audio, daemon=True)
+        self.recording_thread = threading.Thread(
+            target=self._record_audio,
+            args=(self._recording_stopped, self.recording_start_time),
+            daemon=True
+        )
         self.recording_thread.start()
 
         logger.info(f"🔴 Recording started - Keep holding [{self.talk_key.upper()}] key...")
@@ -283,6 +361,7 @@ class PushToTalkListener:
         if recording_duration < self.min_recording_duration:
             logger.info(f"Recording too short ({recording_duration:.1f}s), ignoring")
             self.is_recording = False
+            self._recording_stopped.set()
 
             # Notify voice handler that recording has stopped
             if self.recording_state_callback:
@@ -293,6 +372,7 @@ class PushToTalkListener:
             return
 
         self.is_recording = False
+        self._recording_stopped.set()
         logger.info(f"🔴 Recording stopped ({recording_duration:.1f}s) - Processing speech...")
 
         # Notify voice handler that recording has stopped
@@ -302,58 +382,78 @@ class PushToTalkListener:
             except Exception as e:
                 logger.warning(f"Error notifying recording state stop: {e}")
 
-    def _record_audio(self):
-        """Record audio while key is held down - improved approach with better buffering"""
-        audio_chunks = []
+    def _record_audio(self, stopped: threading.Event, start_time: float):
+        """Record raw microphone audio in one continuous stream while key is held down"""
+        pcm = _acquire_buf(int(self.max_recording_duration * self._sample_rate))
+        write_pos = 0  # in samples
+
+        def _on_audio(in_data, frame_count, time_info, status):
+            nonlocal write_pos
+            # Copy straight into the pooled int16 buffer; audio past max duration is dropped
+            samples = np.frombuffer(in_data, dtype=np.int16)
+            n = min(samples.size, pcm.size - write_pos)
+            pcm[write_pos:write_pos + n] = samples[:n]
+            write_pos += n
+            return (None, pyaudio.paContinue)
+
+        audio_interface = None
+        stream = None
         try:
-            logger.info("Recording thread started - listening for speech...")
-
-            with self.microphone as source:
+            logger.debug("Recording thread started - listening for speech...")
+
+            audio_interface = pyaudio.PyAudio()
+            stream = audio_interface.open(
+                format=pyaudio.paInt16,  # sr.Microphone always captures 16-bit samples
+                channels=1,
+                rate=self._sample_rate,
+                input=True,
+                input_device_index=self.microphone.device_index,
+                frames_per_buffer=1024,
+                stream_callback=_on_audio
+            )
+            if not self._warned_ready:
                 logger.info("Microphone ready - speak now!")
+                self._warned_ready = True
+
+            # Frames are appended by the PortAudio callback; block until key release (no polling)
+            remaining = self.max_recording_duration - (time.time() - start_time)
+            if not stopped.wait(timeout=max(0.0, remaining)):
+                logger.info(f"Max recording duration ({self.max_recording_duration:.0f}s) reached, stopping")
+
+            stream.stop_stream()
+            stream.close()
+            stream = None
 
-                # Record continuously while key is pressed
-                while self.is_recording:
+            # Process the whole utterance if we have any audio
+            if write_pos:
+                recording_duration = time.time() - start_time
+
+                if recording_duration >= self.min_recording_duration:
+                    logger.info(f"Audio captured ({write_pos} samples, {recording_duration:.1f}s total)")
                     try:
-                        # Use shorter segments to capture continuous speech
-                        audio_chunk = self.recognizer.listen(
-                            source,
-                            timeout=0.5,  # Short timeout for responsiveness
-                            phrase_time_limit=2  # 2 second chunks max
-                        )
-                        audio_chunks.append(audio_chunk)
-                        logger.debug("Audio chunk captured")
-
-                    except sr.WaitTimeoutError:
-                        # Timeout is normal - continue if still recording
-                        if self.is_recording:
-                            continue
-                        else:
-                            break
-                    except Exception as chunk_error:
-                        logger.warning(f"Error capturing audio chunk: {chunk_error}")
-                        break
-
-                # Process all collected audio chunks if we have any
-                if audio_chunks:
-                    recording_duration = time.time() - self.recording_start_time
-
-                    if recording_duration >= self.min_recording_duration:
-                        logger.info(f"Audio chunks captured ({len(audio_chunks)} chunks, {recording_duration:.1f}s total)")
-
-                        # Use the largest chunk (likely contains most speech)
-                        largest_chunk = max(audio_chunks, key=lambda x: len(x.get_raw_data()))
-                        self._process_recorded_audio(largest_chunk)
-                    else:
-                        logger.info(f"Recording too short ({recording_duration:.1f}s), ignoring")
+                        self._asr_queue.put_nowait(pcm[:write_pos].tobytes())
+                    except queue.Full:
+                        logger.warning("Speech recognition queue full, dropping this recording")
                 else:
-                    logger.warning("No audio captured during recording")
+                    logger.info(f"Recording too short ({recording_duration:.1f}s), ignoring")
+            else:
+                logger.warning("No audio captured during recording")
 
-        except Exception as e:
-            logger.error(f"Error in recording thread: {e}")
-            import traceback
-            logger.error(f"Recording thread traceback: {traceback.format_exc()}")
+        except Exception:
+            logger.exception("Error in recording thread")
         finally:
-            self.is_recording = False
+            # Only if no newer recording has started in the meantime
+            if self._recording_stopped is stopped:
+                self.is_recording = False
+
+            if stream is not None:
+                try:
+                    stream.close()
+                except Exception:
+                    pass
+            if audio_interface is not None:
+                audio_interface.terminate()
+            _release_buf(pcm)
 
             # Ensure recording state is properly reset even if there were errors
             if self.recording_state_callback:
@@ -362,26 +462,65 @@ class PushToTalkListener:
                 except Exception as e:
                     logger.warning(f"Error notifying recording state stop in finally: {e}")
 
-            logger.info("Recording thread finished")
+            logger.debug("Recording thread finished")
 
-    def _process_recorded_audio(self, audio_data):
-        """Process recorded audio and extract speech"""
+    def _asr_loop(self):
+        """Recognize queued recordings one at a time, merging quick short taps into one request"""
+        while True:
+            raw_audio = self._asr_queue.get()
+            if raw_audio is None:
+                break
+
+            # Repeated short taps become one utterance: one recognizer round-trip instead of several
+            short_clip_bytes = int(self.short_clip_duration * self._sample_rate) * self._sample_width
+            parts = [raw_audio]
+            shutting_down = False
+            while len(parts[-1]) <= short_clip_bytes:
+                try:
+                    next_audio = self._asr_queue.get(timeout=self.coalesce_window)
+                except queue.Empty:
+                    break
+                if next_audio is None:
+                    shutting_down = True
+                    break
+                parts.append(next_audio)
+
+            if len(parts) > 1:
+                logger.info(f"Merged {len(parts)} short recordings into one request")
+                raw_audio = b"".join(parts)
+            self._process_recorded_audio(raw_audio)
+
+            if shutting_down:
+                break
+
+    def _process_recorded_audio(self, raw_audio: bytes):
+        """Process raw recorded PCM and extract speech"""
         try:
             logger.info("Processing recorded speech...")
 
             # Check if audio data is valid
-            if not audio_data:
+            if not raw_audio:
                 logger.warning("No audio data to process")
                 return
 
-            try:
-                raw_data = audio_data.get_raw_data()
-                logger.info(f"Audio data size: {len(raw_data)} bytes")
-                if len(raw_data) < 1000:  # Very small audio
-                    logger.warning("Audio data too small, likely no speech recorded")
-                    return
-            except Exception as e:
-                logger.error(f"Error checking audio data: {e}")
+            logger.info(f"Audio data size: {len(raw_audio)} bytes")
+            if len(raw_audio) < 1000:  # Very small audio
+                logger.warning("Audio data too small, likely no speech recorded")
+                return
+
+            # Skip the Google request for accidental taps / silent recordings (peak first, it's cheaper)
+            pcm = np.frombuffer(raw_audio, dtype=np.int16)
+            if np.abs(pcm).max() < self.silence_peak_threshold:
+                logger.info("Silent recording ignored")
+                return
+            # One float32 conversion, then a dot product (no second array for the squares)
+            samples = pcm.astype(np.float32)
+            rms = float(np.sqrt(np.dot(samples, samples) / samples.size))
+            if rms < self.silence_rms_threshold:
+                logger.info(f"Silent recording ignored (RMS {rms:.0f})")
+                return
+
+            audio_data = sr.AudioData(raw_audio, self._sample_rate, self._sample_width)
 
             # Use Indonesian speech recognition with longer timeout
             try:
@@ -420,23 +559,8 @@ class PushToTalkListener:
 
     def _enhance_speech_text(self, text: str) -> str:
         """Enhance recognized speech text"""
-        # Convert to lowercase for consistency
-        enhanced = text.lower().strip()
-
-        # Fix common Indonesian speech recognition errors
-        replacements = {
-            'sry': 'sri',
-            'shri': 'sri',
-            'seri': 'sri',
-            'cri': 'sri',
-            'tree': 'sri',
-            'free': 'sri'
-        }
-
-        for old, new in replacements.items():
-            enhanced = enhanced.replace(old, new)
-
-        return enhanced
+        # Lowercase for consistency, then fix common Indonesian mis-hearings of "sri" in one pass
+        return _SRI_FIX_RE.sub(lambda m: _SRI_FIXES[m.group(0)], text.lower().strip())
 
     def is_available(self) -> bool:
         """Check if push-to-talk system is available"""
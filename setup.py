@@ -5,6 +5,7 @@ Setup script for SriAI - Automated setup and validation
 
 import os
 import sys
+import json
 import subprocess
 import shutil
 from pathlib import Path
@@ -79,13 +80,16 @@ def validate_env_file():
         'YOUTUBE_STREAM_KEY'
     ]
 
-    missing_vars = []
+    # Parse KEY=value lines once instead of scanning the whole file per variable
+    env = {}
+    for line in env_path.read_text().splitlines():
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        key, _, value = line.partition('=')
+        env[key.strip()] = value.strip()
 
-    with open(env_path, 'r') as f:
-        content = f.read()
-        for var in required_vars:
-            if f"{var}=your_" in content or f"{var}=" not in content:
-                missing_vars.append(var)
+    missing_vars = [var for var in required_vars if not env.get(var) or env[var].startswith('your_')]
 
     if missing_vars:
         print(f"⚠️  Please set these variables in .env: {', '.join(missing_vars)}")
@@ -94,12 +98,26 @@ def validate_env_file():
         print("✅ Environment variables configured")
         return True
 
+IMPORT_CACHE_PATH = Path('.sriai_import_cache.json')
+
 def test_imports():
     """Test if all required modules can be imported"""
+    # Importing faster_whisper pulls in CTranslate2; skip re-checking if nothing changed since the last success
+    cache_key = {
+        "py": sys.executable,
+        "req_mtime": os.path.getmtime('requirements.txt') if os.path.exists('requirements.txt') else None
+    }
+    try:
+        cached = json.loads(IMPORT_CACHE_PATH.read_text())
+        if cached.get("ok") and cached.get("key") == cache_key:
+            print("✅ All required modules can be imported (cached)")
+            return True
+    except (OSError, ValueError):
+        pass
+
     modules = [
         'discord',
-        'whisper',
-        'pyttsx3',
+        'faster_whisper',
         'google.generativeai',
         'dotenv'
     ]
@@ -116,6 +134,10 @@ def test_imports():
         return False
     else:
         print("✅ All required modules can be imported")
+        try:
+            IMPORT_CACHE_PATH.write_text(json.dumps({"ok": True, "key": cache_key}))
+        except OSError:
+            pass
         return True
 
 def main():
@@ -2,18 +2,64 @@ import asyncio
 import subprocess
 import logging
 import os
+import sys
 from typing import Optional
 import signal
 
 logger = logging.getLogger(__name__)
 
+# FFmpeg audio input arguments, chosen once for the platform we're running on
+_FFMPEG_MIC_ARGS = {
+    'win32': ['-f', 'dshow', '-i', 'audio=Microphone'],  # DirectShow
+    'linux': ['-f', 'pulse', '-i', 'default'],  # PulseAudio / PipeWire
+    'darwin': ['-f', 'avfoundation', '-i', ':0'],  # First audio device
+}.get('linux' if sys.platform.startswith('linux') else sys.platform, ['-f', 'dshow', '-i', 'audio=Microphone'])
+
+# Desktop audio capture (Stereo Mix) is only available through DirectShow on Windows
+_FFMPEG_DESKTOP_ARGS = ['-f', 'dshow', '-i', 'audio=Stereo Mix'] if sys.platform == 'win32' else None
+
+# How long ffmpeg must stay up to count as started. dshow device enumeration before failing on a
+# missing input can take well over a second; a failing ffmpeg exits (and wakes the wait) earlier,
+# so only healthy starts wait the full time.
+_FFMPEG_PROBE_TIMEOUT = 3.0
+
 class StreamManager:
     def __init__(self):
-        self.ffmpeg_process: Optional[subprocess.Popen] = None
+        self.ffmpeg_process: Optional[asyncio.subprocess.Process] = None
         self.is_streaming = False
         self.stream_key = os.getenv('YOUTUBE_STREAM_KEY')
         self.rtmp_url = os.getenv('YOUTUBE_RTMP_URL', 'rtmp://a.rtmp.youtube.com/live2/')
 
+        # FFmpeg argv is fixed for the process lifetime, so build it once
+        self._rtmp_target = f'{self.rtmp_url}{self.stream_key or ""}'
+
+        # Microphone-only command (also the fallback for systems without Stereo Mix)
+        self._fallback_argv = (
+            'ffmpeg',
+            *_FFMPEG_MIC_ARGS,
+            '-acodec', 'aac',
+            '-ab', '128k',
+            '-ar', '44100',
+            '-f', 'flv',
+            self._rtmp_target
+        )
+
+        # FFmpeg command to stream desktop audio + microphone to YouTube (None if unsupported)
+        self._primary_argv = None
+        if _FFMPEG_DESKTOP_ARGS is not None:
+            self._primary_argv = (
+                'ffmpeg',
+                *_FFMPEG_DESKTOP_ARGS,  # Desktop audio (you may need to enable this in Windows)
+                *_FFMPEG_MIC_ARGS,  # Microphone input
+                '-filter_complex', '[0:a][1:a]amix=inputs=2[out]',  # Mix both audio sources
+                '-map', '[out]',
+                '-acodec', 'aac',
+                '-ab', '128k',
+                '-ar', '44100',
+                '-f', 'flv',
+                self._rtmp_target
+            )
+
     async def start_streaming(self):
         if self.is_streaming:
             logger.warning("Stream is already running")
@@ -24,64 +70,35 @@ class StreamManager:
             return False
 
         try:
-            # FFmpeg command to stream desktop audio + microphone to YouTube
-            ffmpeg_cmd = [
-                'ffmpeg',
-                '-f', 'dshow',  # DirectShow for Windows
-                '-i', 'audio=Stereo Mix',  # Desktop audio (you may need to enable this in Windows)
-                '-f', 'dshow',
-                '-i', 'audio=Microphone',  # Microphone input
-                '-filter_complex', '[0:a][1:a]amix=inputs=2[out]',  # Mix both audio sources
-                '-map', '[out]',
-                '-acodec', 'aac',
-                '-ab', '128k',
-                '-ar', '44100',
-                '-f', 'flv',
-                f'{self.rtmp_url}{self.stream_key}'
-            ]
-
-            # Alternative command for systems without Stereo Mix
-            fallback_cmd = [
-                'ffmpeg',
-                '-f', 'dshow',
-                '-i', 'audio=Microphone',
-                '-acodec', 'aac',
-                '-ab', '128k',
-                '-ar', '44100',
-                '-f', 'flv',
-                f'{self.rtmp_url}{self.stream_key}'
-            ]
-
             logger.info("Starting YouTube stream...")
 
-            # Try main command first, fallback if it fails
-            try:
-                self.ffmpeg_process = subprocess.Popen(
-                    ffmpeg_cmd,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    stdin=subprocess.PIPE
-                )
-                await asyncio.sleep(3)  # Wait a moment to see if it starts successfully
-
-                if self.ffmpeg_process.poll() is not None:
-                    # Process exited, try fallback
+            if self._primary_argv is None:
+                # No desktop audio capture on this platform: one command, errors surface directly
+                self.ffmpeg_process = await self._spawn_ffmpeg(self._fallback_argv)
+                try:
+                    returncode = await asyncio.wait_for(self.ffmpeg_process.wait(), timeout=_FFMPEG_PROBE_TIMEOUT)
+                    logger.error(f"FFmpeg exited immediately (code {returncode}) - check the audio input device")
+                    self.ffmpeg_process = None
+                    return False
+                except asyncio.TimeoutError:
+                    pass
+            else:
+                # Try main command first, fallback if it fails
+                try:
+                    self.ffmpeg_process = await self._spawn_ffmpeg(self._primary_argv)
+
+                    # Liveness probe: a timeout means ffmpeg is still running
+                    try:
+                        await asyncio.wait_for(self.ffmpeg_process.wait(), timeout=_FFMPEG_PROBE_TIMEOUT)
+                        # Process exited, try fallback
+                        logger.warning("Primary stream command failed, trying fallback...")
+                        self.ffmpeg_process = await self._spawn_ffmpeg(self._fallback_argv)
+                    except asyncio.TimeoutError:
+                        pass
+
+                except Exception:
                     logger.warning("Primary stream command failed, trying fallback...")
-                    self.ffmpeg_process = subprocess.Popen(
-                        fallback_cmd,
-                        stdout=subprocess.PIPE,
-                        stderr=subprocess.PIPE,
-                        stdin=subprocess.PIPE
-                    )
-
-            except Exception:
-                logger.warning("Primary stream command failed, trying fallback...")
-                self.ffmpeg_process = subprocess.Popen(
-                    fallback_cmd,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    stdin=subprocess.PIPE
-                )
+                    self.ffmpeg_process = await self._spawn_ffmpeg(self._fallback_argv)
 
             self.is_streaming = True
             logger.info("YouTube stream started successfully")
@@ -91,6 +108,14 @@ class StreamManager:
             logger.error(f"Failed to start stream: {e}")
             return False
 
+    async def _spawn_ffmpeg(self, cmd):
+        return await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            stdin=subprocess.PIPE
+        )
+
     async def stop_streaming(self):
         if not self.is_streaming or not self.ffmpeg_process:
             logger.warning("No stream is currently running")
@@ -100,19 +125,17 @@ class StreamManager:
             logger.info("Stopping YouTube stream...")
 
             # Send SIGTERM to gracefully stop FFmpeg
-            if self.ffmpeg_process.poll() is None:
+            if self.ffmpeg_process.returncode is None:
                 self.ffmpeg_process.terminate()
 
-                # Wait for graceful shutdown
+                # Wait for graceful shutdown (exit is signalled by the loop, no polling)
                 try:
-                    await asyncio.wait_for(
-                        asyncio.create_task(self._wait_for_process()),
-                        timeout=5.0
-                    )
+                    await asyncio.wait_for(self.ffmpeg_process.wait(), timeout=5.0)
                 except asyncio.TimeoutError:
                     # Force kill if it doesn't stop gracefully
                     logger.warning("Force killing FFmpeg process")
                     self.ffmpeg_process.kill()
+                    await self.ffmpeg_process.wait()
 
             self.ffmpeg_process = None
             self.is_streaming = False
@@ -123,15 +146,11 @@ class StreamManager:
             logger.error(f"Error stopping stream: {e}")
             return False
 
-    async def _wait_for_process(self):
-        while self.ffmpeg_process and self.ffmpeg_process.poll() is None:
-            await asyncio.sleep(0.1)
-
     def get_stream_status(self) -> dict:
         return {
             'is_streaming': self.is_streaming,
             'has_process': self.ffmpeg_process is not None,
-            'process_alive': self.ffmpeg_process.poll() is None if self.ffmpeg_process else False,
+            'process_alive': self.ffmpeg_process.returncode is None if self.ffmpeg_process else False,
             'stream_configured': bool(self.stream_key)
         }
 
@@ -143,6 +162,20 @@ class StreamManager:
 
 # Audio-only streaming for lower bandwidth usage
 class AudioOnlyStreamManager(StreamManager):
+    def __init__(self):
+        super().__init__()
+
+        # Simple audio-only stream - much lower bandwidth
+        self._audio_only_argv = (
+            'ffmpeg',
+            *_FFMPEG_MIC_ARGS,
+            '-acodec', 'aac',
+            '-ab', '64k',  # Lower bitrate for minimal cost
+            '-ar', '22050',  # Lower sample rate
+            '-f', 'flv',
+            self._rtmp_target
+        )
+
     async def start_streaming(self):
         if self.is_streaming:
             logger.warning("Stream is already running")
@@ -153,26 +186,9 @@ class AudioOnlyStreamManager(StreamManager):
             return False
 
         try:
-            # Simple audio-only stream - much lower bandwidth
-            ffmpeg_cmd = [
-                'ffmpeg',
-                '-f', 'dshow',
-                '-i', 'audio=Microphone',
-                '-acodec', 'aac',
-                '-ab', '64k',  # Lower bitrate for minimal cost
-                '-ar', '22050',  # Lower sample rate
-                '-f', 'flv',
-                f'{self.rtmp_url}{self.stream_key}'
-            ]
-
             logger.info("Starting audio-only YouTube stream...")
 
-            self.ffmpeg_process = subprocess.Popen(
-                ffmpeg_cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                stdin=subprocess.PIPE
-            )
+            self.ffmpeg_process = await self._spawn_ffmpeg(self._audio_only_argv)
 
             self.is_streaming = True
             logger.info("Audio-only stream started successfully")
@@ -1,37 +1,140 @@
 import discord
-from discord import sinks
 import asyncio
-import whisper
-import io
-import wave
+import functools
+from faster_whisper import BatchedInferencePipeline, WhisperModel
+import ctranslate2
 import numpy as np
+from scipy.signal import resample_poly
 import logging
 from typing import Optional
-import tempfile
 import os
-import pyttsx3
+import queue
 import threading
-from queue import Queue
+from concurrent.futures import ThreadPoolExecutor
 from local_tts import LocalTTS
 from elevenlabs_tts import ElevenLabsTTS
 from push_to_talk import PushToTalkListener
 
+try:
+    import webrtcvad
+except ImportError:
+    webrtcvad = None  # Optional: Whisper's built-in (Silero) VAD is used without it
+
 logger = logging.getLogger(__name__)
 
+# Discord voice sinks capture 48 kHz stereo; Whisper wants 16 kHz mono
+_SINK_CHANNELS = 2
+_SINK_TO_WHISPER = 3  # 48000 / 16000
+_WHISPER_WINDOW = 16000 * 30  # samples in one Whisper input window
+
+# Greedy decoding for short voice-chat utterances: one hypothesis, no temperature-fallback retries
+_GREEDY_DECODE = {"beam_size": 1, "best_of": 1, "temperature": 0.0}
+_NO_SPEECH_DROP = 0.9  # segments Whisper itself rates as this likely to be non-speech are discarded
+
+# Pooled float32 conversion buffers are this size (30 s of sink audio); longer clips allocate
+STANDARD_SAMPLES = 48000 * _SINK_CHANNELS * 30
+
+# webrtcvad works on 10/20/30 ms int16 frames
+_VAD_FRAME = 480  # 30 ms at 16 kHz
+_VAD_HANGOVER = 10  # 300 ms of non-speech closes a segment
+_VAD_MIN_SPEECH = 10 * _VAD_FRAME  # need at least ~300 ms of speech to be worth decoding
+
+# Sink buffers quieter than this RMS (300 on the 16-bit scale) are background noise / key clicks
+_PREFLIGHT_RMS = 300 / 32768
+
+# lru_cache alone can run the loader twice when two handlers are created at the same time
+_WHISPER_LOCK = threading.Lock()
+
+def _get_whisper(name: str = "base", device: str = "cpu", compute_type: str = "int8") -> WhisperModel:
+    """Load a Whisper model once per process; every VoiceHandler shares the same weights"""
+    with _WHISPER_LOCK:
+        return _load_whisper(name, device, compute_type)
+
+@functools.lru_cache(maxsize=4)
+def _load_whisper(name: str, device: str, compute_type: str) -> WhisperModel:
+    logger.info(f"Loading Whisper model '{name}' ({device}, {compute_type})")
+    return WhisperModel(
+        name,
+        device=device,
+        compute_type=compute_type,
+        cpu_threads=max(1, (os.cpu_count() or 2) // 2),
+        num_workers=1
+    )
+
+def _whisper_device() -> tuple:
+    """Pick (device, compute_type): int8 weights + fp16 activations on CUDA, plain int8 on CPU"""
+    try:
+        if ctranslate2.get_cuda_device_count() > 0:
+            return "cuda", "int8_float16"
+    except Exception:
+        pass
+    return "cpu", "int8"
+
+def _speech_segments(vad, audio: np.ndarray) -> list:
+    """Split 16 kHz float audio into (start, end) sample ranges that webrtcvad marks as speech"""
+    pcm16 = (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16)
+    n_frames = pcm16.size // _VAD_FRAME
+    segments = []
+    start = None
+    silence = 0
+    for i in range(n_frames):
+        frame = pcm16[i * _VAD_FRAME:(i + 1) * _VAD_FRAME].tobytes()
+        if vad.is_speech(frame, 16000):
+            if start is None:
+                start = i
+            silence = 0
+        elif start is not None:
+            silence += 1
+            if silence >= _VAD_HANGOVER:
+                segments.append((start * _VAD_FRAME, (i - silence + 1) * _VAD_FRAME))
+                start = None
+                silence = 0
+    if start is not None:
+        segments.append((start * _VAD_FRAME, (n_frames - silence) * _VAD_FRAME))
+    return segments
+
+def _window_spans(spans: list) -> list:
+    """Merge (start, end) sample ranges into Whisper chunks spanning at most one 30 s window each"""
+    chunks = []
+    for start, end in spans:
+        if chunks and end - chunks[-1][0] <= _WHISPER_WINDOW:
+            chunks[-1] = (chunks[-1][0], end)
+            continue
+        while end - start > _WHISPER_WINDOW:
+            chunks.append((start, start + _WHISPER_WINDOW))
+            start += _WHISPER_WINDOW
+        chunks.append((start, end))
+    return chunks
+
 class VoiceHandler:
     def __init__(self, bot):
         self.bot = bot
-        self.whisper_model = whisper.load_model("base")  # Free, lightweight model
-        self.tts_engine = pyttsx3.init()
-        self.tts_queue = Queue()
+        # Whisper and its batched pipeline load on the first sink recording (_ensure_whisper), so
+        # push-to-talk-only runs never pay the model load time or memory
+        self.whisper_model = None
+        self._batched_whisper = None
+        # Pinning the language skips Whisper's language-detection pass (Sri is Indonesian-first);
+        # an empty WHISPER_LANGUAGE opts into per-clip auto-detection instead
+        self.whisper_language = os.getenv('WHISPER_LANGUAGE', 'id').strip() or None
+        # Push-to-talk speaker name is process-static, so read it once
+        self._main_user = os.getenv('MAIN_USER', 'User')
+        # Single worker serializes this handler's transcriptions
+        self._asr_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="asr")
+        self._f32_pool = queue.SimpleQueue()  # reusable STANDARD_SAMPLES float32 buffers, filled on use
+        self._vad = webrtcvad.Vad(2) if webrtcvad is not None else None
         self.is_recording = False
         self.voice_client: Optional[discord.VoiceClient] = None
+        self._loop = None  # bot loop, cached on first use (bot.loop isn't available before login)
 
         # Push-to-talk only system
         self.push_to_talk = PushToTalkListener(self._process_push_to_talk_input, None)
 
         # Store the channel where voice input was activated
         self.voice_input_channel = None
+        # guild.id -> first text channel Sri can post in (fallback when no input channel is stored)
+        self._default_text_channel = {}
+        # channel.id -> pending debounced leave-check task
+        self._leave_checks = {}
 
         logger.info("SriAI configured for push-to-talk only mode")
 
@@ -51,47 +154,11 @@ class VoiceHandler:
 
         # Track when Sri is speaking for TTS management
         self.sri_is_speaking = False
-
-        # Configure TTS
-        self.tts_engine.setProperty('rate', 150)
-        voices = self.tts_engine.getProperty('voices')
-        if voices:
-            self.tts_engine.setProperty('voice', voices[0].id)
-
-        # Start TTS thread
-        self.tts_thread = threading.Thread(target=self._tts_worker, daemon=True)
-        self.tts_thread.start()
+        # If the primary TTS hasn't produced audio by then, hand the text to the fallback
+        self.tts_first_audio_timeout = 2.5  # seconds
 
         # Voice processing handled by push-to-talk directly
 
-    def _tts_worker(self):
-        while True:
-            try:
-                text = self.tts_queue.get(timeout=1)
-                if text is None:
-                    break
-                self._generate_speech(text)
-                self.tts_queue.task_done()
-            except:
-                continue
-
-    def _generate_speech(self, text: str):
-        try:
-            with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as temp_file:
-                temp_path = temp_file.name
-
-            self.tts_engine.save_to_file(text, temp_path)
-            self.tts_engine.runAndWait()
-
-            if self.voice_client and self.voice_client.is_connected():
-                audio_source = discord.FFmpegPCMAudio(temp_path)
-                self.voice_client.play(audio_source, after=lambda e: os.unlink(temp_path) if e is None else logger.error(f"TTS playback error: {e}"))
-            else:
-                os.unlink(temp_path)
-
-        except Exception as e:
-            logger.error(f"TTS generation error: {e}")
-
     async def join_channel(self, channel):
         try:
             # Clean up any existing connection first
@@ -103,6 +170,9 @@ class VoiceHandler:
                 self.voice_client = None
                 await asyncio.sleep(1)
 
+            # Resolve the fallback text channel now rather than on every utterance
+            self._get_default_text_channel(channel.guild)
+
             # Try single connection attempt for TTS-only mode
             try:
                 self.voice_client = await channel.connect(timeout=15.0)
@@ -120,6 +190,19 @@ class VoiceHandler:
             self.voice_client = None
             return False
 
+    def _get_default_text_channel(self, guild):
+        """First text channel Sri can send to in this guild (cached per guild)"""
+        if guild.id not in self._default_text_channel:
+            self._default_text_channel[guild.id] = next(
+                (c for c in guild.text_channels if c.permissions_for(guild.me).send_messages),
+                None
+            )
+        return self._default_text_channel[guild.id]
+
+    def invalidate_text_channel(self, guild):
+        """Forget the cached fallback channel after channel or role permission changes (or a failed send)"""
+        self._default_text_channel.pop(guild.id, None)
+
     async def leave_channel(self):
         if self.voice_client and self.voice_client.is_connected():
             await self.voice_client.disconnect()
@@ -139,16 +222,30 @@ class VoiceHandler:
 
     async def handle_user_leave(self, member, channel):
         logger.info(f"{member.name} left {channel.name}")
-        # Wait a bit before checking if we should leave to avoid race conditions
-        await asyncio.sleep(2)
-        if self.voice_client and self.voice_client.channel == channel:
-            # Count non-bot members only
-            human_members = [m for m in channel.members if not m.bot]
-            if len(human_members) == 0:
-                logger.info("No human members left, leaving voice channel")
-                await self.leave_channel()
-            else:
-                logger.info(f"{len(human_members)} human members still in channel")
+        # Debounce: one pending check per channel, restarted by every leave (a mass leave scans once)
+        pending = self._leave_checks.pop(channel.id, None)
+        if pending:
+            pending.cancel()
+        self._leave_checks[channel.id] = asyncio.create_task(self._leave_check(channel))
+
+    async def _leave_check(self, channel):
+        try:
+            # Wait a bit before checking if we should leave to avoid race conditions
+            await asyncio.sleep(2)
+            # Past the debounce window: detach so a later leave can't cancel us mid-disconnect
+            if self._leave_checks.get(channel.id) is asyncio.current_task():
+                del self._leave_checks[channel.id]
+
+            if self.voice_client and self.voice_client.channel == channel:
+                # Count non-bot members only
+                human_members = [m for m in channel.members if not m.bot]
+                if len(human_members) == 0:
+                    logger.info("No human members left, leaving voice channel")
+                    await self.leave_channel()
+                else:
+                    logger.info(f"{len(human_members)} human members still in channel")
+        except Exception as e:
+            logger.error(f"Error checking voice channel members: {e}")
 
     async def start_listening(self, channel=None):
         # Store the channel for voice responses
@@ -176,19 +273,36 @@ class VoiceHandler:
 
         # Stop Discord voice recording (if any)
         if self.voice_client and self.is_recording:
+            # Clear the flag first so the finish callback never sees a stale "recording" state
+            self.is_recording = False
             try:
                 self.voice_client.stop_recording()
-                self.is_recording = False
                 logger.info("Stopped voice recording")
             except Exception as e:
                 logger.error(f"Failed to stop recording: {e}")
 
 
+    def _get_loop(self):
+        if self._loop is None:
+            self._loop = self.bot.loop
+        return self._loop
+
+    def _schedule(self, coro):
+        """Run a coroutine on the bot's loop, whether called from the loop or another thread"""
+        loop = self._get_loop()
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            return loop.create_task(coro)
+        return asyncio.run_coroutine_threadsafe(coro, loop)
+
     def _process_push_to_talk_input(self, text: str):
         """Process voice input from push-to-talk system (synchronous version)"""
         try:
             # Get the bot's event loop (main loop) and schedule the async task
-            loop = self.bot.loop
+            loop = self._get_loop()
             if loop and loop.is_running():
                 # Schedule the coroutine to run on the main event loop
                 asyncio.run_coroutine_threadsafe(
@@ -205,9 +319,8 @@ class VoiceHandler:
         try:
             logger.info(f"Processing push-to-talk input: {text}")
 
-            # Get user name from MAIN_USER environment variable
-            import os
-            username = os.getenv('MAIN_USER', 'User')
+            # User name from MAIN_USER (read once at startup)
+            username = self._main_user
 
             # For push-to-talk, always process the input (no need to check for "Sri" mention)
             # since user intentionally pressed the button to talk
@@ -221,22 +334,32 @@ class VoiceHandler:
                 # Send text response to Discord
                 try:
                     target_channel = None
+                    fallback_guild = None
+                    message = f"🎙️ **Push-to-talk:** {text}\n\n{response}"
 
                     # Use stored voice input channel
                     if self.voice_input_channel and hasattr(self.voice_input_channel, 'send'):
                         target_channel = self.voice_input_channel
                     else:
-                        # Fallback: Find any available channel
+                        # Fallback: First sendable channel of any guild (resolved once per guild)
                         for guild in self.bot.guilds:
-                            for channel in guild.text_channels:
-                                if channel.permissions_for(guild.me).send_messages:
-                                    target_channel = channel
-                                    break
+                            target_channel = self._get_default_text_channel(guild)
                             if target_channel:
+                                fallback_guild = guild
                                 break
 
                     if target_channel:
-                        await target_channel.send(f"🎙️ **Push-to-talk:** {text}\n\n{response}")
+                        try:
+                            await target_channel.send(message)
+                        except discord.Forbidden:
+                            if fallback_guild is None:
+                                raise
+                            # Cached channel went stale (e.g. Sri's own roles changed): resolve it again
+                            self.invalidate_text_channel(fallback_guild)
+                            target_channel = self._get_default_text_channel(fallback_guild)
+                            if target_channel is None:
+                                raise
+                            await target_channel.send(message)
                         logger.info(f"Sent push-to-talk response to channel: {target_channel.name}")
 
                 except Exception as e:
@@ -255,25 +378,42 @@ class VoiceHandler:
 
 
     def _recording_finished(self, sink, channel, *args):
-        asyncio.create_task(self._process_recordings(sink, channel))
+        # Called from the voice receive thread, which has no running loop of its own
+        self._schedule(self._process_recordings(sink, channel))
 
-    async def _process_recordings(self, sink: sinks.WaveSink, channel):
+    async def _process_recordings(self, sink: "discord.sinks.WaveSink", channel):
         try:
+            # Collect every speaker first so all clips go to the ASR thread in one job.
+            # Views over the sink's own buffers (getbuffer), so no per-speaker bytes copy.
+            users, clips = [], []
+            buf = None
             for user_id, audio_data in sink.audio_data.items():
                 user = self.bot.get_user(user_id)
                 if user and user != self.bot.user:
-                    text = await self._transcribe_audio(audio_data)
-                    if text.strip():
-                        logger.info(f"Transcribed from {user.name}: {text}")
-                        # Send to AI assistant for processing
-                        response = await self.bot.ai_assistant.process_message(text, user.display_name)
-                        if response:  # Sri will only respond if she should
-                            logger.info(f"Sri responding: {response}")
-                            # Use ElevenLabs TTS with Local TTS fallback
-                            try:
-                                await self._speak_with_fallback(response)
-                            except Exception as tts_error:
-                                logger.error(f"Error with TTS system: {tts_error}")
+                    buf = audio_data.file.getbuffer()
+                    users.append(user)
+                    clips.append(np.frombuffer(buf, dtype=np.int16, count=len(buf) // 2))
+
+            texts = []
+            if clips:
+                loop = asyncio.get_running_loop()
+                texts = await loop.run_in_executor(self._asr_pool, self._run_whisper_batch, clips)
+            # Drop every buffer view, including the loop's last memoryview: a live view pins the
+            # sink's BytesIO (resizing it raises BufferError) and keeps its memory from being freed
+            del clips, buf
+
+            for user, text in zip(users, texts):
+                if text.strip():
+                    logger.info(f"Transcribed from {user.name}: {text}")
+                    # Send to AI assistant for processing
+                    response = await self.bot.ai_assistant.process_message(text, user.display_name)
+                    if response:  # Sri will only respond if she should
+                        logger.info(f"Sri responding: {response}")
+                        # Use ElevenLabs TTS with Local TTS fallback
+                        try:
+                            await self._speak_with_fallback(response)
+                        except Exception as tts_error:
+                            logger.error(f"Error with TTS system: {tts_error}")
 
             # Restart recording after processing
             if self.voice_client and self.voice_client.is_connected():
@@ -282,18 +422,101 @@ class VoiceHandler:
         except Exception as e:
             logger.error(f"Error processing recordings: {e}")
 
-    async def _transcribe_audio(self, audio_data) -> str:
+    def _acquire_f32(self, n: int) -> np.ndarray:
+        """Pooled float32 buffer with room for n samples (fresh allocation for oversized clips)"""
+        if n > STANDARD_SAMPLES:
+            return np.empty(n, dtype=np.float32)
         try:
-            # Convert audio data to numpy array
-            audio_array = np.frombuffer(audio_data.read(), dtype=np.int16)
-            audio_array = audio_array.astype(np.float32) / 32768.0
-
-            # Use Whisper to transcribe
-            result = self.whisper_model.transcribe(audio_array)
-            return result["text"].strip()
-        except Exception as e:
-            logger.error(f"Transcription error: {e}")
-            return ""
+            return self._f32_pool.get_nowait()
+        except queue.Empty:
+            return np.empty(STANDARD_SAMPLES, dtype=np.float32)
+
+    def _release_f32(self, buf: np.ndarray):
+        if buf.shape[0] == STANDARD_SAMPLES:
+            self._f32_pool.put(buf)
+
+    def _ensure_whisper(self):
+        """Load Whisper on first use (runs on the ASR thread, so the event loop never waits on it)"""
+        if self._batched_whisper is None:
+            # Free, lightweight model on CTranslate2 with int8 weights (faster and ~4x smaller than fp32);
+            # runs on the GPU when CTranslate2 sees a CUDA device
+            # WHISPER_MODEL picks the size/variant (e.g. tiny, small, or distil-small.en for English-only)
+            self.whisper_model = _get_whisper(os.getenv('WHISPER_MODEL', 'base'), *_whisper_device())
+            # Batched pipeline over the same weights: decodes a clip's VAD segments together
+            self._batched_whisper = BatchedInferencePipeline(model=self.whisper_model)
+
+    def _run_whisper_batch(self, clips: list) -> list:
+        """Transcribe several speakers' clips in one ASR job, one Whisper call per speaker"""
+        self._ensure_whisper()
+        texts = []
+        for pcm in clips:
+            try:
+                prepared = self._prepare_audio(pcm)
+                texts.append(self._decode(*prepared) if prepared is not None else "")
+            except Exception as e:
+                logger.error(f"Transcription error: {e}")
+                texts.append("")
+        return texts
+
+    def _prepare_audio(self, pcm: np.ndarray):
+        """Sink PCM -> 16 kHz mono float32, as (audio, speech chunks or None); None if there's nothing to decode"""
+        # Scale int16 -> float32 in one pass into a pooled buffer
+        n = pcm.shape[0] - pcm.shape[0] % _SINK_CHANNELS
+        buf = self._acquire_f32(n)
+        try:
+            scaled = np.multiply(pcm[:n], np.float32(1.0 / 32768.0), out=buf[:n], casting="unsafe")
+            # Preflight energy gate on the raw sink audio: quiet buffers (another speaker's turn
+            # bleeding in, keyboard clicks) skip downmix, resampling and Whisper altogether
+            if n == 0 or float(np.dot(scaled, scaled)) / n < _PREFLIGHT_RMS * _PREFLIGHT_RMS:
+                return None
+            # Downmix (allocates the much smaller mono array, so the buffer can go back right after)
+            mono = scaled.reshape(-1, _SINK_CHANNELS).mean(axis=1)
+        finally:
+            self._release_f32(buf)
+
+        # Single polyphase 3:1 decimation to 16 kHz (anti-aliased, done in C)
+        audio_array = resample_poly(mono, up=1, down=_SINK_TO_WHISPER, window=('kaiser', 5.0)).astype(np.float32, copy=False)
+
+        # Energy gate: skip the encoder pass for taps (< 250 ms) and near-silent clips
+        if audio_array.size < 4000 or np.abs(audio_array).max() < 0.02:
+            return None
+        rms = float(np.sqrt(np.dot(audio_array, audio_array) / audio_array.size))
+        if rms < 0.005:
+            return None
+
+        # Cheap frame-level VAD: drop clips without speech; the spans become Whisper's chunks,
+        # so its own (Silero) VAD doesn't have to run again
+        if self._vad is not None:
+            spans = _speech_segments(self._vad, audio_array)
+            if sum(end - start for start, end in spans) < _VAD_MIN_SPEECH:
+                return None
+            return audio_array, _window_spans(spans)
+        return audio_array, None
+
+    def _decode(self, audio_array: np.ndarray, chunks) -> str:
+        """Run Whisper on one speaker's prepared clip, its speech chunks decoded as one batch"""
+        # One call per speaker: the pipeline may join neighbouring clip_timestamps into a single
+        # 30 s chunk (and segment), so audio from different speakers must never share an input
+        if chunks is None:
+            vad = {}  # no webrtcvad: Whisper's own VAD finds the speech chunks
+        else:
+            vad = {"vad_filter": False, "clip_timestamps": [{"start": start, "end": end} for start, end in chunks]}
+
+        # Batched chunks are independent, so no prompt is carried between 30 s windows;
+        # segments decode lazily, so join them here too
+        segments, _ = self._batched_whisper.transcribe(
+            audio_array,
+            language=self.whisper_language,
+            task="transcribe",
+            batch_size=8,
+            no_speech_threshold=0.6,
+            compression_ratio_threshold=2.4,
+            **vad,
+            **_GREEDY_DECODE
+        )
+        return "".join(
+            segment.text for segment in segments if segment.no_speech_prob <= _NO_SPEECH_DROP
+        ).strip()
 
     async def _speak_with_fallback(self, text: str) -> bool:
         """Speak text using primary TTS (ElevenLabs) with fallback to Local TTS"""
@@ -307,9 +530,27 @@ class VoiceHandler:
         # Try primary TTS (ElevenLabs) first
         try:
             if hasattr(self.primary_tts, 'speak_async'):
-                success = await self.primary_tts.speak_async(text)
+                # Race first audio against a short timeout instead of waiting out a stalled request
+                started = asyncio.Event()
+                primary = asyncio.create_task(self.primary_tts.speak_async(text, started=started))
+                first_audio = asyncio.create_task(started.wait())
+                await asyncio.wait(
+                    {primary, first_audio},
+                    timeout=self.tts_first_audio_timeout,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                first_audio.cancel()
+
+                if started.is_set() or primary.done():
+                    # Audio is playing (let it finish) or the request already failed fast
+                    success = await primary
+                else:
+                    # Stalled: cancel so a late response can't talk over the fallback
+                    logger.warning(f"⚠ ElevenLabs produced no audio within {self.tts_first_audio_timeout}s")
+                    primary.cancel()
+                    success = False
             else:
-                success = self.primary_tts.speak(text)
+                success = await self.primary_tts.speak_and_wait(text)
 
             if success:
                 logger.info("✓ ElevenLabs TTS completed successfully")
@@ -323,7 +564,7 @@ class VoiceHandler:
         # Try fallback if primary failed
         if not success and self.fallback_tts:
             try:
-                success = self.fallback_tts.speak(text)
+                success = await self.fallback_tts.speak_and_wait(text)
                 if success:
                     logger.info("✓ Local TTS fallback completed")
                 else:
@@ -339,7 +580,7 @@ class VoiceHandler:
     def speak_text(self, text: str):
         """Synchronous wrapper for ElevenLabs TTS with fallback"""
         try:
-            asyncio.create_task(self._speak_with_fallback(text))
+            self._schedule(self._speak_with_fallback(text))
         except Exception as e:
             logger.error(f"Error in speak_text: {e}")
             # Emergency fallback to local TTS